@@ -1,86 +1,593 @@
 import psycopg as pg
-from psycopg.rows import dict_row
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row, class_row, namedtuple_row, scalar_row, tuple_row
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 from pathlib import Path
-from configparser import ConfigParser
 import bcrypt
 
 from datetime import date
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from typing import NamedTuple
+
+# Seconds a memoized COUNT(*) of the Athletes table is reused before it is queried again
+ATHLETE_COUNT_TTL = 5.0
+# Number of successful logins remembered and for how many seconds, so repeated logins skip bcrypt
+AUTH_CACHE_SIZE = 4096
+AUTH_CACHE_TTL = 60.0
+# bcrypt cost for users without their own cost in the Users table
+BCRYPT_COST = 12
+# Filter lists longer than this are copied into a temporary table instead of being sent as an array
+COPY_FILTER_THRESHOLD = 1000
+# Rows fetched per round trip by the server-side cursors of the iter_all_* methods
+CURSOR_ITERSIZE = 1000
+# Channel notified by the Competitions trigger in sql/003_notify_places_changed.sql
+PLACES_CHANNEL = 'places_changed'
+# Channel notified by the triggers in sql/001_mv_results_denorm.sql when mv_results_denorm is out of date
+RESULTS_VIEW_CHANNEL = 'mv_results_denorm_stale'
+
+# Statements run on (almost) every request, executed with prepare=True so they are parsed and planned once per connection
+ROLES_QUERY = "SELECT username, role_name FROM Users WHERE username = ANY(%s)"
+USER_LOGIN_QUERY = "SELECT role_name, password_hashed, cost FROM Users WHERE username=%s"
+
+# Number of user roles remembered and for how many seconds, roles change very rarely
+ROLE_CACHE_SIZE = 4096
+ROLE_CACHE_TTL = 30.0
+
+# Arguments of every pooled connection. Statements are prepared from their second execution on a connection,
+# statements on per-call temporary tables opt out with prepare=False, COPY is never prepared
+POOL_CONNECTION_KWARGS = {'autocommit': True, 'row_factory': dict_row, 'prepare_threshold': 1}
+
+# Roles that are allowed to add and delete rows
+EDITOR_ROLES = ['editor', 'theone']
+
+
+def _encode_cursor_token(key: str, order: str, value, row_id: int) -> str:
+    """
+    Serialize the seek position of a keyset page into an opaque url-safe token.
+    """
+    payload = json.dumps([key, order, value, row_id], default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor_token(token: str, key: str, order: str) -> tuple:
+    """
+    Read the (sort value, id) seek position back from a token made by _encode_cursor_token.
+
+    Raises a DataError if the token is malformed or was made for a different sort order.
+    """
+    try:
+        token_key, token_order, value, row_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise pg.errors.DataError(f'Invalid cursor token: {token}')
+    if token_key != key or token_order != order:
+        raise pg.errors.DataError(f'The cursor token was created for a different sort order! Token: {token}')
+    return (value, row_id)
+
+
+def _configure_connection(conn: pg.Connection) -> None:
+    """
+    Set up a new pooled connection. Up to 200 prepared statements are kept per connection,
+    the least recently used one is deallocated when there are more.
+    """
+    conn.prepared_max = 200
+
+
+async def _configure_async_connection(conn: pg.AsyncConnection) -> None:
+    """
+    Same as _configure_connection for connections of the asyncio pool.
+    """
+    conn.prepared_max = 200
+
+
+class Sport(NamedTuple):
+    """
+    Row of the Sports table.
+    """
+    id: int
+    name: str
+
+
+class Athlete(NamedTuple):
+    """
+    Row of the Athletes table.
+    """
+    id: int
+    name: str
+    gender: str
+    height: float
+
+
+class Result(NamedTuple):
+    """
+    Row of the Results table.
+
+    The columns are the ones the results join reads (r.competitionID, r.sportID, r.athleteID, r.result,
+    see sql/001_mv_results_denorm.sql). They are unquoted in the schema, so they are returned in lower case.
+    """
+    competitionid: int
+    sportid: int
+    athleteid: int
+    result: float
+
+
+class ResultRow(NamedTuple):
+    """
+    Row of a page of retrieve_results_from_sports_and_places_page.
+    """
+    place: str
+    held: date
+    sport: str
+    athleteid: int
+    name: str
+    result: float
+
+
+# Columns selected for each row type, listed explicitly so only what the named tuples hold is sent
+_SPORT_COLUMNS = ', '.join(Sport._fields)
+_ATHLETE_COLUMNS = ', '.join(Athlete._fields)
+_RESULT_COLUMNS = ', '.join(Result._fields)
+
+
+def _athlete_page_queries(key: str, order: str) -> dict[str, sql.Composed]:
+    """
+    Compose the statements retrieve_athletes_page runs for a sort key and order.
+
+    Ties on the sort key are broken by id so the seek position is always unique.
+    name, gender and height may be NULL: NULLs sort last ascending and first descending
+    (PostgreSQL's default, so the (key, id) indexes still serve the order), and 'seek_null'
+    continues a page that ended on a NULL sort value.
+    """
+    direction = sql.SQL('DESC' if order == 'desc' else 'ASC')
+    comparator = sql.SQL('<' if order == 'desc' else '>')
+    if key == 'id':
+        order_by = sql.SQL("ORDER BY id {}").format(direction)
+        seek = sql.SQL("WHERE id {} %s").format(comparator)
+        seek_null = seek
+    else:
+        column = sql.Identifier(key)
+        nulls = sql.SQL('NULLS FIRST' if order == 'desc' else 'NULLS LAST')
+        order_by = sql.SQL("ORDER BY {column} {direction} {nulls}, id {direction}").format(
+            column=column, direction=direction, nulls=nulls)
+        if order == 'desc':
+            # The NULLs came first, past a non-NULL value only smaller values are left
+            seek = sql.SQL("WHERE ({}, id) < (%s, %s)").format(column)
+            seek_null = sql.SQL("WHERE ({column} IS NULL AND id < %s) OR {column} IS NOT NULL").format(column=column)
+        else:
+            # The NULLs come last, they are still ahead of any non-NULL value
+            seek = sql.SQL("WHERE (({column}, id) > (%s, %s) OR {column} IS NULL)").format(column=column)
+            seek_null = sql.SQL("WHERE {} IS NULL AND id > %s").format(column)
+    select = sql.SQL(f"SELECT {_ATHLETE_COLUMNS} FROM Athletes")
+    return {
+        'offset': sql.SQL(' ').join([select, order_by, sql.SQL("LIMIT %s OFFSET %s")]),
+        'first': sql.SQL(' ').join([select, order_by, sql.SQL("LIMIT %s")]),
+        'seek': sql.SQL(' ').join([select, seek, order_by, sql.SQL("LIMIT %s")]),
+        'seek_null': sql.SQL(' ').join([select, seek_null, order_by, sql.SQL("LIMIT %s")]),
+    }
+
+
+# Statements for every (sort key, order) of retrieve_athletes_page, composed once at import
+_ATHLETE_PAGE_QUERIES = {
+    (key, order): _athlete_page_queries(key, order)
+    for key in ('id', 'name', 'gender', 'height') for order in ('asc', 'desc')
+}
+
+
+def _athlete_sort(sort_by: dict | None) -> tuple[str, str]:
+    """
+    Validate a sort_by dict of retrieve_athletes_page and return its (key, order), defaulting to ('id', 'asc').
+    """
+    key = 'id'
+    order = 'asc'
+    if sort_by is not None:
+        key = sort_by['key']
+        if sort_by['order'] == 'desc':
+            order = 'desc'
+        if (key, order) not in _ATHLETE_PAGE_QUERIES:
+            raise pg.errors.DataError(f'The provided sort key does not match any columns of the Athletes table! Key: {key}')
+    return (key, order)
+
+
+def _athlete_keyset_query(key: str, order: str, cursor_token: str | None, items_per_page: int) -> tuple[sql.Composed, list]:
+    """
+    Pick the statement and parameters for the athlete page that follows cursor_token.
+    """
+    queries = _ATHLETE_PAGE_QUERIES[(key, order)]
+    if cursor_token is None:
+        return (queries['first'], [items_per_page])
+    value, last_id = _decode_cursor_token(cursor_token, key, order)
+    if key == 'id' or value is None:
+        return (queries['seek_null' if value is None else 'seek'], [last_id, items_per_page])
+    return (queries['seek'], [value, last_id, items_per_page])
+
+
+def _next_athlete_token(rows: list[Athlete], items_per_page: int, key: str, order: str) -> str | None:
+    """
+    Token for the page after rows, or None if rows is the last page.
+    """
+    if len(rows) < items_per_page:
+        return None
+    last = rows[-1]
+    return _encode_cursor_token(key, order, getattr(last, key), last.id)
+
+
+# Statements for every (sort key, order) of retrieve_competitions_from_place_page, composed once at import
+# so each combination is always sent with the same text and can be prepared.
+# Ties on the sort key are broken by id, so LIMIT/OFFSET pages neither repeat nor skip rows
+_COMPETITION_PAGE_QUERIES = {
+    (key, order): sql.SQL(
+        "SELECT id, place, held, COUNT(*) OVER() AS total_count FROM Competitions WHERE place=%s"
+        " ORDER BY {} LIMIT %s OFFSET %s"
+    ).format(sql.SQL(', ').join(
+        sql.SQL("{} {}").format(sql.Identifier(column), sql.SQL(order.upper()))
+        for column in dict.fromkeys((key, 'id'))
+    ))
+    for key in ('id', 'place', 'held') for order in ('asc', 'desc')
+}
+
+# Columns of retrieve_results_from_sports_and_places_page, in the order used to break ties on the sort key.
+# The view has no unique key, so all of them are compared: rows that still tie are identical
+_RESULT_PAGE_COLUMNS = ('place', 'sport', 'held', 'athleteid', 'name', 'result')
+
+
+def _result_page_order_by(key: str | None, order: str) -> sql.Composed:
+    """
+    Compose the ORDER BY clause of a results page sorted on key, or in the default order if key is None.
+    """
+    columns = [sql.SQL("{} ASC").format(sql.Identifier(column)) for column in _RESULT_PAGE_COLUMNS if column != key]
+    if key is not None:
+        columns.insert(0, sql.SQL("{} {}").format(sql.Identifier(key), sql.SQL(order.upper())))
+    return sql.SQL(" ORDER BY {}").format(sql.SQL(', ').join(columns))
+
+
+# ORDER BY clauses for every (sort key, order) of retrieve_results_from_sports_and_places_page,
+# the None key is the default order (place, sport, held as in mv_results_denorm_place_sport_held_idx)
+_RESULT_PAGE_ORDER_BY = {
+    (key, order): _result_page_order_by(key, order)
+    for key in (None, *_RESULT_PAGE_COLUMNS) for order in ('asc', 'desc')
+}
+
+
+def _target_cost(user: dict | None) -> int:
+    """
+    The bcrypt cost a user's password is hashed at: the user's own cost, or BCRYPT_COST if they have none.
+    """
+    if user is not None and user['cost']:
+        return user['cost']
+    return BCRYPT_COST
+
+
+@functools.lru_cache(maxsize=8)
+def _dummy_hash(cost: int) -> bytes:
+    """
+    A bcrypt hash at the given cost that no password is checked against successfully.
+
+    Made on first use rather than at import, since hashing at cost 12 takes a noticeable amount of time.
+    """
+    return bcrypt.hashpw(secrets.token_bytes(16), bcrypt.gensalt(cost))
+
+
+def _stored_hash(user: dict | None, dummy_cost: int) -> bytes:
+    """
+    The bcrypt hash to check a login against.
+
+    Unknown users are checked against a dummy hash at dummy_cost, so a login takes as long whether or not the username exists.
+    password_hashed is bytea (sql/002_users_password_bytea.sql), which psycopg returns as bytes.
+    """
+    if user is None:
+        return _dummy_hash(dummy_cost)
+    return user['password_hashed']
+
+
+# '%%' or a '%(key)s' reference, the interpolation ConfigParser applied to config values
+_CONFIG_INTERPOLATION = re.compile(r'%(%|\((\w+)\)s)')
+
+
+def _interpolate_config_value(key: str, values: dict[str, str], depth: int=0) -> str:
+    """
+    Resolve the value of key the way ConfigParser's default interpolation did: '%%' becomes '%'
+    and '%(other)s' is replaced by the value of other in the same section.
+
+    Raises an Exception for any other use of '%' or a reference that can't be resolved.
+    """
+    if depth > 10:
+        raise Exception(f'Config value {key} references itself')
+
+    def replace(match: re.Match) -> str:
+        if match.group(1) == '%':
+            return '%'
+        name = match.group(2).lower()
+        if name not in values:
+            raise Exception(f'Config value {key} references the missing key {name}')
+        return _interpolate_config_value(name, values, depth + 1)
+
+    value = values[key]
+    if '%' in _CONFIG_INTERPOLATION.sub('', value):
+        raise Exception(f"Config value {key} has a '%' that is not followed by '%' or '(key)s', write a literal '%' as '%%'")
+    return _CONFIG_INTERPOLATION.sub(replace, value)
+
+
+def _config_mtime(file: str) -> float | None:
+    """
+    Modification time of a config file, or None if it cannot be read.
+    """
+    try:
+        return os.path.getmtime(file)
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=8)
+def _load_config(file: str, section: str='postgresql', mtime: float | None=None) -> tuple[str, str]:
+    """
+    Read the connection string from a database config file that has a section [postgresql]
+
+    The result is cached, so constructing several DatabaseAPI objects from the same file only reads it once.
+    The modification time is part of the cache key, so an edited file is read again.
+
+    Parameters
+    ----------
+    file: str
+        Path to the database config file in the following format:
+            [section]
+            host=
+            database=
+            user=
+            password=
+    section: str
+        The section name in the config file.
+        Default = 'postgresql'
+    mtime: float | None
+        Modification time of the file, see _config_mtime. Only used as part of the cache key
+    Returns
+    -------
+    tuple[str, str]
+        The connection string and the database user
+    """
+    # The file is a handful of key=value lines, parsed by hand instead of importing configparser
+    try:
+        lines = Path(file).read_text().splitlines()
+    except OSError:
+        lines = []
+    db = None
+    current = None
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith((';', '#')):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            current = line[1:-1].strip()
+            if current == section and db is None:
+                db = {}
+        elif current == section:
+            # Like ConfigParser, a key is separated from its value by the first '=' or ':'
+            separators = [i for i in (line.find('='), line.find(':')) if i != -1]
+            if separators:
+                split = min(separators)
+                db[line[:split].strip().lower()] = line[split + 1:].strip()
+    # get section, default to postgresql
+    if db is None:
+        raise Exception('Section {0} not found in the {1} file'.format(section, file))
+    missing = [key for key in ('host', 'database', 'user', 'password') if key not in db]
+    if missing:
+        raise Exception('Section {0} of the {1} file is missing: {2}'.format(section, file, ', '.join(missing)))
+    db = {key: _interpolate_config_value(key, db) for key in db}
+    # make_conninfo quotes values with spaces, quotes or backslashes, e.g. in passwords
+    conn_string = make_conninfo(host=db['host'], dbname=db['database'], user=db['user'], password=db['password'])
+    return (conn_string, db['user'])
+
 
 class DatabaseAPI:
-    def __init__(self, db_init: Path, section='postgresql') -> None:
+    def __init__(self, db_init: Path, section='postgresql', min_size: int=4, max_size: int=32) -> None:
         """
         Constructor
+
+        Parameters
+        ----------
+        db_init: Path
+            The database config file
+        section: str
+            The section name in the config file.
+            Default = 'postgresql'
+        min_size: int
+            Number of connections each connection pool keeps open
+        max_size: int
+            Maximum number of connections each connection pool opens under load
         """
-        cfg = self.__config(db_init, section)
-        self.main_role = cfg['user']
-        self.conn_string = "host=%(host)s dbname=%(database)s user=%(user)s password=%(password)s" % (cfg)
-        try:
-            self.connection = pg.connect(self.conn_string, autocommit=True, row_factory=dict_row)
-        except Exception as e:
-            self.connection = None
-            raise e
+        self.conn_string, self.main_role = _load_config(str(db_init), section, _config_mtime(db_init))
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+        # Opened by the first async call on an event loop, see _get_async_pool
+        self._async_pool = None
+        self._async_pool_lock = None
+        self._async_loop = None
+        self._listener_stop = threading.Event()
+        # Set by the listener thread once LISTEN has run, cleared when it exits
+        self._listening = threading.Event()
+        # bcrypt releases the GIL while hashing, so worker threads compare passwords in parallel
+        self._bcrypt_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='bcrypt')
+        self.pool = self.__create_pool()
+        self._dummy_cost = self.__typical_cost()
+        # Hash the dummy in the background, the first unknown username would otherwise take longer than a real login
+        self._bcrypt_pool.submit(_dummy_hash, self._dummy_cost)
+        self._athlete_count = None
+        # username -> (role, time it expires), least recently used first
+        self._role_cache = OrderedDict()
+        self._role_lock = threading.Lock()
+        # Successful logins keyed by (username, HMAC of the password), the plaintext is never stored
+        self._auth_secret = secrets.token_bytes(32)
+        self._auth_cache = OrderedDict()
+        self._auth_lock = threading.Lock()
+        # Usernames with a rehash scheduled on the bcrypt workers, guarded by _auth_lock
+        self._rehash_pending = set()
+        # Distinct places are cached until a notification on PLACES_CHANNEL, the Gender table never changes
+        self._places_cache = None
+        self._places_version = 0
+        self._genders_cache = None
+        self._listener = None
+        self.__start_listener()
         
 
-    def __del__(self) -> None:
+    def __enter__(self) -> 'DatabaseAPI':
         """
-        Destructor. Ensures the connection gets closed.
+        Use the API as a context manager, the connection pool is closed when the with block exits.
+
+        The asyncio pool opened by the async methods can't be closed from a plain with block,
+        use 'async with' instead, or await aclose() before the block exits.
         """
-        if self.connection is not None:
-            self.connection.close()
+        return self
+
 
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
-    def __config(self, file: Path, section='postgresql') -> dict:
+
+    async def __aenter__(self) -> 'DatabaseAPI':
+        """
+        Use the API as an async context manager, both connection pools are closed when the block exits.
         """
-        Read the values from a database config file that has a section [postgresql]
+        return self
+
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+        # Closing the pool waits for its connections, keep that off the event loop
+        await asyncio.to_thread(self.close)
+
+
+    def __create_pool(self) -> ConnectionPool:
+        """
+        Create a connection pool and wait until its minimum number of connections are established.
+
+        Every method borrows a connection from the pool for the duration of the call,
+        broken connections are checked and replaced before they are handed out.
 
-        Parameters
-        ----------
-        file: Path
-            The database config file in the following format:
-                [section]
-                host=
-                database=
-                user=
-                password=
-        section: str
-            The section name in the config file.
-            Default = 'postgresql'
         Returns
         -------
-        dict
-            Dictionary where key-value matches the config file
-        """
-        # create a parser
-        parser = ConfigParser()
-        # read config file
-        parser.read(file)
-        # get section, default to postgresql
-        db = {}
-        if parser.has_section(section):
-            params = parser.items(section)
-            for param in params:
-                db[param[0]] = param[1]
-        else:
-            raise Exception('Section {0} not found in the {1} file'.format(section, file))
-        return db
+        ConnectionPool
+            The opened pool
+        """
+        pool = ConnectionPool(self.conn_string, min_size=self.min_size, max_size=self.max_size,
+                              kwargs=POOL_CONNECTION_KWARGS,
+                              configure=_configure_connection,
+                              check=ConnectionPool.check_connection, open=False)
+        try:
+            pool.open(wait=True)
+        except Exception as e:
+            pool.close()
+            raise e
+        return pool
+
+
+    def __typical_cost(self) -> int:
+        """
+        The bcrypt cost most users' passwords are hashed at, used for the dummy hash of unknown users
+        so that their logins take as long as those of real users.
+        """
+        query = """
+            SELECT COALESCE(cost, %s) AS cost FROM Users
+            GROUP BY 1 ORDER BY COUNT(*) DESC, 1 DESC LIMIT 1
+            """
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(query, [BCRYPT_COST]).fetchone()
+            return BCRYPT_COST if row is None else row['cost']
+        except Exception as e:
+            print(e)
+            return BCRYPT_COST
+
+
+    def __start_listener(self) -> None:
+        """
+        Start a daemon thread that listens on PLACES_CHANNEL and drops the cached places when notified,
+        and on RESULTS_VIEW_CHANNEL to refresh mv_results_denorm.
+        """
+        self._listener_stop.clear()
+        self._listener = threading.Thread(target=self.__listen_for_changes, name='db-listener', daemon=True)
+        self._listener.start()
+
+
+    def __listen_for_changes(self) -> None:
+        """
+        Body of the listener thread. Uses its own connection since LISTEN is bound to a session.
+
+        mv_results_denorm is refreshed here rather than by the writing statements, once for all the
+        notifications of the last second, so writers never wait for the refresh.
+        """
+        try:
+            with pg.connect(self.conn_string, autocommit=True) as conn:
+                conn.execute(f"LISTEN {PLACES_CHANNEL}")
+                conn.execute(f"LISTEN {RESULTS_VIEW_CHANNEL}")
+                self._listening.set()
+                while not self._listener_stop.is_set():
+                    stale = False
+                    for notify in conn.notifies(timeout=1.0):
+                        if notify.channel == PLACES_CHANNEL:
+                            self._invalidate_places()
+                        else:
+                            stale = True
+                    if stale:
+                        try:
+                            conn.execute("SELECT refresh_mv_results_denorm()")
+                        except pg.errors.Error as e:
+                            # Keep listening, the next notification tries again
+                            print(e)
+        except Exception as e:
+            print(e)
+        finally:
+            self._listening.clear()
+            # Changes after this point are not notified, don't keep what was cached
+            self._invalidate_places()
+
+
+    def _invalidate_places(self) -> None:
+        """
+        Drop the cached places, and make any read that started before this call skip caching its result.
+        """
+        self._places_version += 1
+        self._places_cache = None
 
 
     def open(self) -> None:
         """
-        Opens a new connection.
+        Opens a new connection pool.
         
-        If a previous connection was established it is closed before opening the new connection.
+        If a previous pool was opened it is closed before opening the new pool.
         """
-        if self.connection is not None:
-            self.connection.close()
-        self.connection = pg.connect(self.conn_string)
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        self._bcrypt_pool.shutdown(wait=False)
+        self._bcrypt_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='bcrypt')
+        self.pool = self.__create_pool()
+        # A listener stopped by close() may still be winding down, wait for it and start a fresh one
+        self._listener_stop.set()
+        self._listener.join()
+        self.__start_listener()
 
 
     def close(self) -> None:
         """
-        Closes the connection to the database.
+        Closes the connection pool to the database.
         """
-        self.connection.close()
+        self._listener_stop.set()
+        if self.pool is not None:
+            self.pool.close()
+        self._bcrypt_pool.shutdown(wait=False)
 
 
     def __get_current_role__(self) -> str:
@@ -93,7 +600,8 @@ class DatabaseAPI:
             Returns the current role used in the database.
         """
         try:
-            return self.connection.execute("SELECT current_user AS user;").fetchone()['user']
+            with self.pool.connection() as conn:
+                return conn.execute("SELECT current_user AS user;").fetchone()['user']
         except Exception as e:
             print(e)
             raise e
@@ -114,132 +622,368 @@ class DatabaseAPI:
         str
             The role of the user or None if they do not exist or the password is incorrect.
         """
+        cache_key = (username, hmac.new(self._auth_secret, password.encode('utf-8'), hashlib.sha256).digest())
+        role = self._cached_login(cache_key)
+        if role is not None:
+            return role
         try:
-            user = self.connection.execute("SELECT * FROM Users WHERE username=%s", [username]).fetchone()
-            if bcrypt.checkpw(password.encode('utf-8'), user['password_hashed'].encode('utf-8')):
+            user = self._fetch_user(username)
+            self._remember_role(username, user)
+            stored = _stored_hash(user, self._dummy_cost)
+            checked = self._bcrypt_pool.submit(bcrypt.checkpw, password.encode('utf-8'), stored)
+            if checked.result() and user is not None:
+                # Only successful logins are cached, failed attempts always pay the full bcrypt cost
+                self._cache_login(cache_key, user['role_name'])
+                self._rehash_if_needed(username, password, user, stored)
                 return user['role_name']
         except Exception as e:
             print(e)
-            return None
+        return None
 
 
-    def retrieve_all_sports(self) -> list[dict_row]:
+    async def async_check_user_credentials(self, username:str, password:str) -> str:
         """
-        Get all rows from the Sports table.
+        Check a user's login information without blocking the event loop.
+
+        Same as check_user_credentials, but the Users query and the bcrypt comparison run on worker threads.
+
+        Parameters
+        ----------
+        username: str
+        password: str
 
         Returns
         -------
-        list[dict_row]
-            A list of rows, where each row is a dict with the table columns as keys.
+        str
+            The role of the user or None if they do not exist or the password is incorrect.
         """
+        cache_key = (username, hmac.new(self._auth_secret, password.encode('utf-8'), hashlib.sha256).digest())
+        role = self._cached_login(cache_key)
+        if role is not None:
+            return role
         try:
-            rows = self.connection.execute("SELECT * FROM Sports").fetchall()
-            return rows
+            user = await asyncio.to_thread(self._fetch_user, username)
+            self._remember_role(username, user)
+            stored = _stored_hash(user, self._dummy_cost)
+            loop = asyncio.get_running_loop()
+            checked = await loop.run_in_executor(self._bcrypt_pool, bcrypt.checkpw, password.encode('utf-8'), stored)
+            if checked and user is not None:
+                self._cache_login(cache_key, user['role_name'])
+                self._rehash_if_needed(username, password, user, stored)
+                return user['role_name']
         except Exception as e:
             print(e)
-            raise e
+        return None
 
 
-    def delete_sport(self, username: str, sport:str) -> None:
+    def _rehash_if_needed(self, username: str, password: str, user: dict_row, stored: bytes) -> None:
+        """
+        Schedule a rehash of the user's password if it was hashed with a higher cost than the user's target cost.
+
+        Only called after a successful login, the rehash runs on the bcrypt workers so the login is not delayed.
+        At most one rehash per user is pending, concurrent logins don't queue their own.
         """
-        Delete a given sport from the Sports table
+        target_cost = _target_cost(user)
+        # bcrypt hashes look like $2b$<cost>$<salt and hash>
+        if int(stored.split(b'$')[2]) <= target_cost:
+            return
+        with self._auth_lock:
+            if username in self._rehash_pending:
+                return
+            self._rehash_pending.add(username)
+        self._bcrypt_pool.submit(self._rehash_password, username, password, target_cost, stored)
+
+
+    def _rehash_password(self, username: str, password: str, cost: int, stored: bytes) -> None:
+        """
+        Hash a password with the given bcrypt cost and store it for the user.
+
+        The row is only updated if it still holds stored, the hash the password was verified against,
+        so a password changed while bcrypt was running is not overwritten with the old one.
+        """
+        try:
+            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(cost))
+            with self.pool.connection() as conn:
+                conn.execute("UPDATE Users SET password_hashed=%s WHERE username=%s AND password_hashed=%s",
+                             (hashed, username, stored))
+        except Exception as e:
+            print(e)
+        finally:
+            with self._auth_lock:
+                self._rehash_pending.discard(username)
+
+
+    def _fetch_user(self, username: str) -> dict_row:
+        """
+        Get the login columns of a user, or None if there is no such user.
+
+        The columns are all included in users_username_idx, so this is an index-only scan.
+        """
+        with self.pool.connection() as conn:
+            return conn.execute(USER_LOGIN_QUERY, [username], prepare=True).fetchone()
+
+
+    def _remember_role(self, username: str, user: dict | None) -> None:
+        """
+        Replace the cached role of a user with the one just read by a login, or drop it if the user is gone.
+        """
+        if user is None:
+            with self._role_lock:
+                self._role_cache.pop(username, None)
+        else:
+            self._cache_role(username, user['role_name'])
+
+
+    def logout(self, username: str) -> None:
+        """
+        Forget the cached logins and role of a user, so the next request reads them from the Users table again.
 
         Parameters
         ----------
         username: str
-            The user attempting to delete a sport row
-        sport: str
-            The name of the sport
         """
-        # TODO: Task 4
-        try:
-            # Check if the user exists and their role
-            role_query = "SELECT role_name FROM Users WHERE username=%s"
-            role_result = self.connection.execute(role_query, (username,)).fetchone()
+        with self._role_lock:
+            self._role_cache.pop(username, None)
+        with self._auth_lock:
+            for cache_key in [key for key in self._auth_cache if key[0] == username]:
+                del self._auth_cache[cache_key]
 
-            if role_result is None:
-                raise Exception("Username not found")
 
-            role = role_result[0]
+    def _cached_login(self, cache_key: tuple[str, bytes]) -> str | None:
+        """
+        Look up a login that succeeded less than AUTH_CACHE_TTL seconds ago.
 
-            # Check if user has the correct role
-            if role not in ["editor", "theone"]:
-                raise PermissionError("You do not have permission to delete a sport.")
-            
-                    # Delete related records from results table first
-            delete_results_query = """
-                DELETE FROM results WHERE sport_id = (
-                    SELECT id FROM sports WHERE name=%s
-                )
-                """
-            self.connection.execute(delete_results_query, (sport,))
+        Returns
+        -------
+        str | None
+            The role of the user or None if the login is not cached or has expired.
+        """
+        with self._auth_lock:
+            entry = self._auth_cache.get(cache_key)
+            if entry is None:
+                return None
+            role, expires = entry
+            if time.monotonic() >= expires:
+                del self._auth_cache[cache_key]
+                return None
+            self._auth_cache.move_to_end(cache_key)
+            return role
+
+
+    def _cache_login(self, cache_key: tuple[str, bytes], role: str) -> None:
+        """
+        Remember a successful login, evicting the least recently used one when the cache is full.
+        """
+        with self._auth_lock:
+            self._auth_cache[cache_key] = (role, time.monotonic() + AUTH_CACHE_TTL)
+            self._auth_cache.move_to_end(cache_key)
+            if len(self._auth_cache) > AUTH_CACHE_SIZE:
+                self._auth_cache.popitem(last=False)
+
+
+    def retrieve_all_sports(self) -> list[Sport]:
+        """
+        Get all rows from the Sports table.
+
+        Returns
+        -------
+        list[Sport]
+            A list of rows, where each row is a named tuple with the table columns as fields.
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor(row_factory=class_row(Sport)) as cur:
+                rows = cur.execute(f"SELECT {_SPORT_COLUMNS} FROM Sports", prepare=True).fetchall()
+            return rows
+        except Exception as e:
+            print(e)
+            raise e
 
-            # Perform the deletion
-            delete_query = "DELETE FROM Sports WHERE name=%s"
-            self.connection.execute(delete_query, (sport,))
-            self.connection.commit()
+    def iter_all_sports(self) -> Iterator[Sport]:
+        """
+        Iterate over all rows from the Sports table without loading the whole table.
+
+        The rows are read through a server-side cursor, CURSOR_ITERSIZE rows at a time.
+        The pooled connection is held until the iteration finishes or the generator is closed.
+
+        Yields
+        ------
+        Sport
+            A named tuple with the table columns as fields.
+        """
+        try:
+            # Named cursors only live inside a transaction, the pooled connections are in autocommit
+            with self.pool.connection() as conn, conn.transaction(), \
+                    conn.cursor('all_sports_cur', row_factory=class_row(Sport)) as cur:
+                cur.itersize = CURSOR_ITERSIZE
+                cur.execute(f"SELECT {_SPORT_COLUMNS} FROM Sports")
+                yield from cur
         except Exception as e:
             print(e)
             raise e
 
 
-    def retrieve_athletes_page(self, page: int, items_per_page: int, sort_by: dict | None=None) -> tuple[list[dict_row], int]:
+    def retrieve_athletes_page(self, cursor_token: str | None, items_per_page: int, sort_by: dict | None=None,
+                               page: int | None=None) -> tuple[list[Athlete], int, str | None]:
         """
-        Get paginated rows from the Athletes table.
+        Get paginated rows from the Athletes table using keyset pagination.
+
+        Rows are located by seeking past the last row of the previous page on (sort key, id),
+        so every page costs the same no matter how deep it is. Callers that need to jump to an
+        absolute page number can pass page instead, which skips the earlier rows with OFFSET.
 
         Parameters
         ----------
-        page: int
-            Current page number (1-indexed)
+        cursor_token: str | None
+            Token returned with the previous page, or None for the first page
         items_per_page: int
             Number of items to return
         sort_by: dict | None
             A dict in the following format: {'key': column_name, 'order': 'asc' | 'desc'}
+        page: int | None
+            Absolute page number (1-indexed). When given, cursor_token is ignored
 
         Returns
         -------
-        tuple[list[dict_row], int]
-            A tuple with the list of rows for the page and the amount of rows there are in total in the table
+        tuple[list[Athlete], int, str | None]
+            A tuple with the list of rows for the page, the amount of rows there are in total in the table
+            and the token for the next page (None when there are no more rows)
         """
         try:
-            query = "SELECT * FROM Athletes"
-            start = (page-1) * items_per_page
-            end = start + items_per_page
-            rows = []
-            if sort_by is not None:
-                columns = set(['id', 'name', 'gender', 'height'])
-                key = sort_by['key']
-                if key not in columns:
-                    raise pg.errors.DataError(f'The provided sort key does not match any columns of the Athletes table! Key: {key}')
-                if sort_by['order'] == 'desc':
-                    query += f" ORDER BY {key} DESC" 
+            key, order = _athlete_sort(sort_by)
+
+            with self.pool.connection() as conn:
+                if page is not None:
+                    # Skipped rows are stepped over on the server and never sent to the client,
+                    # a plain cursor does it in one round trip where a named one needs DECLARE, MOVE and FETCH
+                    start = (page-1) * items_per_page
+                    with conn.cursor(row_factory=class_row(Athlete)) as cur:
+                        cur.arraysize = items_per_page
+                        cur.execute(_ATHLETE_PAGE_QUERIES[(key, order)]['offset'], [items_per_page, start])
+                        rows = cur.fetchmany()
                 else:
-                    query += f" ORDER BY {key}" 
-            
-            # NOTE: Python fetchall Solution
-            # Downside of this is that it retrieves all rows
-            # query += f" LIMIT {items_per_page} OFFSET {start}"
-            # rows = self.connection.execute(query).fetchall()
-            # return (rows[start:end], len(rows))
-
-            # NOTE: SQL LIMIT + OFFSET Solution
-            # Downside of this that you have to execute an additional query to get total rows
-            # query += f" LIMIT {items_per_page} OFFSET {start}" 
-            # total = self.connection.execute("SELECT COUNT(*) FROM Athletes").fetchone()['count']
-            # rows = self.connection.execute(query).fetchall()
-            # return (rows, total)
-
-            # NOTE: Python fetchmany Solution
-            with self.connection.execute(query) as cur:
-                total = cur.rowcount # Get number of effected rows
-                if start != 0:
-                    cur.fetchmany(start) # Offset
-                rows = cur.fetchmany(items_per_page) # Limit
-            return (rows, total)
+                    query, params = _athlete_keyset_query(key, order, cursor_token, items_per_page)
+                    with conn.cursor(row_factory=class_row(Athlete)) as cur:
+                        rows = cur.execute(query, params).fetchall()
+                total = self._count_athletes(conn)
+
+            return (rows, total, _next_athlete_token(rows, items_per_page, key, order))
+        except Exception as e:
+            print(e)
+            raise e
+
+
+    async def retrieve_athletes_page_async(self, cursor_token: str | None, items_per_page: int,
+                                           sort_by: dict | None=None) -> tuple[list[Athlete], int, str | None]:
+        """
+        Get paginated rows from the Athletes table using keyset pagination, without blocking the event loop.
+
+        Same as retrieve_athletes_page with a cursor token. The page and the total count are
+        queried concurrently on separate connections of an asyncio pool.
+
+        Parameters
+        ----------
+        cursor_token: str | None
+            Token returned with the previous page, or None for the first page
+        items_per_page: int
+            Number of items to return
+        sort_by: dict | None
+            A dict in the following format: {'key': column_name, 'order': 'asc' | 'desc'}
+
+        Returns
+        -------
+        tuple[list[Athlete], int, str | None]
+            A tuple with the list of rows for the page, the amount of rows there are in total in the table
+            and the token for the next page (None when there are no more rows)
+        """
+        try:
+            key, order = _athlete_sort(sort_by)
+            query, params = _athlete_keyset_query(key, order, cursor_token, items_per_page)
+            pool = await self._get_async_pool()
+            rows, total = await asyncio.gather(self._fetch_athletes_async(pool, query, params),
+                                               self._count_athletes_async(pool))
+            return (rows, total, _next_athlete_token(rows, items_per_page, key, order))
         except Exception as e:
             print(e)
             raise e
 
+
+    async def _get_async_pool(self) -> AsyncConnectionPool:
+        """
+        Get the asyncio connection pool, opening it on first use since it needs a running event loop.
+
+        The pool belongs to the loop it was opened on. When called from another loop, e.g. a second
+        asyncio.run(), a new pool is opened: the old one's worker tasks died with their loop.
+        """
+        loop = asyncio.get_running_loop()
+        # No await until the pool and lock are replaced, so other tasks of the loop can't interleave
+        if self._async_loop is not loop:
+            self._async_pool = None
+            self._async_pool_lock = asyncio.Lock()
+            self._async_loop = loop
+        async with self._async_pool_lock:
+            if self._async_pool is None:
+                pool = AsyncConnectionPool(self.conn_string, min_size=self.min_size, max_size=self.max_size,
+                                           kwargs=POOL_CONNECTION_KWARGS,
+                                           configure=_configure_async_connection,
+                                           check=AsyncConnectionPool.check_connection, open=False)
+                await pool.open(wait=True)
+                self._async_pool = pool
+        return self._async_pool
+
+
+    async def aclose(self) -> None:
+        """
+        Closes the asyncio connection pool, if it was opened on the running event loop.
+        """
+        if self._async_pool is not None and self._async_loop is asyncio.get_running_loop():
+            await self._async_pool.close()
+        self._async_pool = None
+
+
+    async def _fetch_athletes_async(self, pool: AsyncConnectionPool, query: sql.Composed, params: list) -> list[Athlete]:
+        """
+        Run an athlete page query on a connection of the asyncio pool.
+        """
+        async with pool.connection() as conn, conn.cursor(row_factory=class_row(Athlete)) as cur:
+            await cur.execute(query, params)
+            return await cur.fetchall()
+
+
+    async def _count_athletes_async(self, pool: AsyncConnectionPool) -> int:
+        """
+        Same as _count_athletes, querying on a connection of the asyncio pool.
+        """
+        now = time.monotonic()
+        if self._athlete_count is None or now - self._athlete_count[1] > ATHLETE_COUNT_TTL:
+            async with pool.connection() as conn:
+                cur = await conn.execute("SELECT COUNT(*) FROM Athletes")
+                total = (await cur.fetchone())['count']
+            self._athlete_count = (total, now)
+        return self._athlete_count[0]
+
+
+    def _count_athletes(self, conn: pg.Connection) -> int:
+        """
+        Get the number of rows in the Athletes table.
+
+        The count is memoized for ATHLETE_COUNT_TTL seconds since it rarely changes between requests.
+
+        Parameters
+        ----------
+        conn: Connection
+            Connection used if the count has to be queried
+
+        Returns
+        -------
+        int
+            The number of athletes
+        """
+        now = time.monotonic()
+        if self._athlete_count is None or now - self._athlete_count[1] > ATHLETE_COUNT_TTL:
+            total = conn.execute("SELECT COUNT(*) FROM Athletes").fetchone()['count']
+            self._athlete_count = (total, now)
+        return self._athlete_count[0]
+
     def add_athlete(self, username:str, name: str, gender: str, height: float) -> None:
         """
         Add a new athlete to the Athletes table. Uses INSERT INTO
@@ -255,34 +999,126 @@ class DatabaseAPI:
             Height of the athlete
         """
         # TODO: Task 2 (SQL Query)
+        # The role check and the insert are a single statement, the row is only inserted if the user is an editor
         query = """
-            INSERT INTO Athletes (name, height, gender)
-            VALUES (%s, %s, %s)
+            WITH u AS (SELECT role_name FROM Users WHERE username=%s),
+            ins AS (
+                INSERT INTO Athletes (name, height, gender)
+                SELECT %s, %s, %s WHERE EXISTS (SELECT 1 FROM u WHERE role_name = ANY(%s))
+                RETURNING id
+            )
+            SELECT (SELECT role_name FROM u) AS role_name, (SELECT id FROM ins) AS id
                 """
         try:
-            role_query = "SELECT role_name FROM Users WHERE username=%s"
-            role_result = self.connection.execute(role_query, (username,)).fetchone()
+            with self.pool.connection() as conn:
+                result = conn.execute(query, (username, name, height, gender, EDITOR_ROLES)).fetchone()
 
-            if role_result is None:
+            if result['role_name'] is None:
                 raise Exception("Username not found")
 
-            role = role_result['role_name']
+            if result['id'] is None:
+                raise PermissionError("You do not have permission to add athletes.")
+            self._athlete_count = None
+        except Exception as e:
+            print(e)
+            raise e
+
+
+    def add_athletes_bulk(self, username: str, athletes: Iterable[tuple[str, str, float]]) -> None:
+        """
+        Add several athletes to the Athletes table, checking the user's role once for the whole batch.
+
+        The rows are streamed with COPY, which is a single statement no matter how many rows there are.
+
+        Parameters
+        ----------
+        username: str
+        athletes: Iterable[tuple[str, str, float]]
+            (name, gender, height) of each athlete
+        """
+        query = "COPY Athletes (name, gender, height) FROM STDIN"
+        try:
+            role = self._get_role(username)
+
+            if role is None:
+                raise Exception("Username not found")
 
-            if role not in ["editor", "theone"]:
+            if role not in EDITOR_ROLES:
                 raise PermissionError("You do not have permission to add athletes.")
 
-            # Insert athlete into database
-            query = """
-                INSERT INTO Athletes (name, height, gender)
-                VALUES (%s, %s, %s)
-            """
-            self.connection.execute(query, (name, height, gender))
-            self.connection.commit()
+            with self.pool.connection() as conn, conn.cursor() as cur, cur.copy(query) as copy:
+                for athlete in athletes:
+                    copy.write_row(athlete)
+            self._athlete_count = None
         except Exception as e:
             print(e)
             raise e
 
 
+    def _get_roles(self, usernames: list[str]) -> dict[str, str]:
+        """
+        Get the roles of several users, querying all of those that are not cached in one round trip.
+
+        Parameters
+        ----------
+        usernames: list[str]
+
+        Returns
+        -------
+        dict[str, str]
+            username -> role. Users that do not exist are left out.
+        """
+        roles = {}
+        missing = []
+        for username in usernames:
+            role = self._cached_role(username)
+            if role is not None:
+                roles[username] = role
+            else:
+                missing.append(username)
+        if missing:
+            with self.pool.connection() as conn:
+                rows = conn.execute(ROLES_QUERY, (missing,), prepare=True).fetchall()
+            for row in rows:
+                roles[row['username']] = row['role_name']
+                self._cache_role(row['username'], row['role_name'])
+        return roles
+
+
+    def _cached_role(self, username: str) -> str | None:
+        """
+        Look up a role that was read less than ROLE_CACHE_TTL seconds ago, expired entries are dropped.
+        """
+        with self._role_lock:
+            entry = self._role_cache.get(username)
+            if entry is None:
+                return None
+            role, expires = entry
+            if time.monotonic() >= expires:
+                del self._role_cache[username]
+                return None
+            self._role_cache.move_to_end(username)
+            return role
+
+
+    def _cache_role(self, username: str, role: str) -> None:
+        """
+        Remember a user's role, evicting the least recently used one when the cache is full.
+        """
+        with self._role_lock:
+            self._role_cache[username] = (role, time.monotonic() + ROLE_CACHE_TTL)
+            self._role_cache.move_to_end(username)
+            if len(self._role_cache) > ROLE_CACHE_SIZE:
+                self._role_cache.popitem(last=False)
+
+
+    def _get_role(self, username: str) -> str | None:
+        """
+        Get the role of a user (cached for ROLE_CACHE_TTL seconds), or None if the user does not exist.
+        """
+        return self._get_roles([username]).get(username)
+
+
     def add_athlete_sql_function(self, username:str, name:str, gender: str, height: float) -> int:
         """
         Add a new athlete to the Athletes table. Uses NewAthlete SQL function
@@ -304,12 +1140,13 @@ class DatabaseAPI:
         """
         # TODO: Task 2 (SQL Function)
         query = """
-                SELECT Insert_athlete(%s, %s, %s, %s)
+                SELECT Insert_athlete(%s, %s, %s, %s) AS id
                 """
         try:
-            result = self.connection.execute(query, (username, name, height, gender)).fetchone()
-            self.connection.commit()
-            return result[0]
+            with self.pool.connection() as conn:
+                result = conn.execute(query, (username, name, height, gender)).fetchone()
+            self._athlete_count = None
+            return result['id']
     
         except Exception as e:
             print(e)
@@ -332,24 +1169,32 @@ class DatabaseAPI:
         Returns
         -------
         tuple[list[dict_row], int]
-            A tuple with the list of rows for the page and the amount of rows there are in total in the table
+            A tuple with the list of rows for the page and the amount of rows there are in total in the table.
         """
         try:
             start = (page-1) * items_per_page
-            end = start + items_per_page
-            rows = []
+            # Only the rows of the page are sent, the total is counted by the window function in the same query
+            key = 'id'
+            order = 'asc'
             if sort_by is not None:
-                columns = set(['id', 'place', 'held'])
                 key = sort_by['key']
-                if key not in columns:
-                    raise pg.errors.DataError(f'The provided sort key does not match any columns of the Competitions table! Key: {key}')
                 if sort_by['order'] == 'desc':
-                    rows = self.connection.execute(f"SELECT * FROM Competitions WHERE place=%s ORDER BY {key} DESC", [place]).fetchall()
+                    order = 'desc'
+            query = _COMPETITION_PAGE_QUERIES.get((key, order))
+            if query is None:
+                raise pg.errors.DataError(f'The provided sort key does not match any columns of the Competitions table! Key: {key}')
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, [place, items_per_page, start], prepare=True).fetchall()
+                if rows:
+                    total = rows[0]['total_count']
+                elif start > 0:
+                    # A page past the last row has no row to carry the window count
+                    total = conn.execute("SELECT COUNT(*) AS total_count FROM Competitions WHERE place=%s", [place]).fetchone()['total_count']
                 else:
-                    rows = self.connection.execute(f"SELECT * FROM Competitions WHERE place=%s ORDER BY {key}", [place]).fetchall()
-            else:
-                rows = self.connection.execute("SELECT * FROM Competitions WHERE place=%s", [place]).fetchall()
-            return (rows[start:end], len(rows))
+                    total = 0
+            for row in rows:
+                del row['total_count']
+            return (rows, total)
         except Exception as e:
             print(e)
             raise e
@@ -359,14 +1204,42 @@ class DatabaseAPI:
         """
         Return all distinct places
 
+        The places are cached until the Competitions table notifies a change.
+
         Returns
         -------
         list[str]
             List of places
         """
         try:
-            rows = self.connection.execute("SELECT DISTINCT place FROM Competitions").fetchall()
-            return [p['place'] for p in rows]
+            # The cache can only be trusted while the listener is subscribed to PLACES_CHANNEL
+            listening = self._listening.is_set()
+            places = self._places_cache
+            if places is not None and listening:
+                return list(places)
+            version = self._places_version
+            # Loose index scan: each step seeks the next larger place in competitions_place_held_idx,
+            # so one index probe is made per distinct place instead of reading every competition
+            query = """
+                WITH RECURSIVE t AS (
+                    (SELECT place FROM Competitions ORDER BY place LIMIT 1)
+                    UNION ALL
+                    SELECT (SELECT place FROM Competitions WHERE place > t.place ORDER BY place LIMIT 1)
+                    FROM t WHERE t.place IS NOT NULL
+                )
+                SELECT place FROM t WHERE place IS NOT NULL
+                -- The scan stops at NULL, which SELECT DISTINCT returned as a place of its own
+                UNION ALL
+                SELECT NULL WHERE EXISTS (SELECT 1 FROM Competitions WHERE place IS NULL)
+                """
+            # Each row is read as the place string itself, no dict is built per row
+            with self.pool.connection() as conn, conn.cursor(row_factory=scalar_row) as cur:
+                places = cur.execute(query, prepare=True).fetchall()
+            # Don't cache a result that may have been read before a notification arrived,
+            # or before LISTEN ran, since a change in between would never be notified
+            if listening and version == self._places_version:
+                self._places_cache = places
+            return list(places)
         except Exception as e:
             print(e)
             raise e
@@ -391,34 +1264,23 @@ class DatabaseAPI:
             ID of the newly inserted row
 
         """
-        # TODO: Task 3: Add competition using an SQL Function
-        query = """
-                INSERT INTO Competitions (place, held)
-                VALUES (%s, %s)
-                RETURNING id
-                """
+        # The role check, the date validation and the insert run in insert_competition (sql/005_insert_competition.sql)
+        query = "SELECT insert_competition(%s, %s, %s, %s) AS id"
         try:
-            # Check user role
-            role_query = "SELECT role_name FROM Users WHERE username=%s"
-            role_result = self.connection.execute(role_query, (username,)).fetchone()
-
-            if role_result is None:
-                raise Exception("Username not found")
-            
-
-            # Checking if the user has the permission to add competition
-            role = role_result['role_name']
-            if role not in ["editor", "theone"]:
-                raise PermissionError("you have no permission to add competitions.")
-            
-
-            # Validating date if it is later than 2024
-            competition_year = int(held.split("-")[0]) # Only taking the YYYY part of the date structure
-            if competition_year < 2024:
-                raise ValueError("Competitions have to be held after 2024.")
-
-            result = self.connection.execute(query, (place, held)).fetchone()
-            self.connection.commit()
+            # A malformed date is rejected here without a round trip, and the parameter is sent typed as a date
+            if held is not None:
+                held = date.fromisoformat(held)
+            with self.pool.connection() as conn:
+                try:
+                    result = conn.execute(query, (username, place, held, EDITOR_ROLES), prepare=True).fetchone()
+                except pg.errors.NoDataFound:
+                    raise Exception("Username not found") from None
+                except pg.errors.InsufficientPrivilege:
+                    raise PermissionError("you have no permission to add competitions.") from None
+                except pg.errors.DatetimeFieldOverflow:
+                    raise ValueError("Competitions have to be held after 2024.") from None
+            # Don't wait for the notification to reach the listener, this instance may be asked for the places right away
+            self._invalidate_places()
             return result['id']
         
 
@@ -427,26 +1289,50 @@ class DatabaseAPI:
             raise e 
 
 
-    def retrieve_all_results(self) -> list[dict_row]:
+    def retrieve_all_results(self) -> list[Result]:
         """
         Get all rows from the Results table.
 
         Returns
         -------
-        list[dict_row]
-            A list of rows, where each row is a dict with the table columns as keys.
+        list[Result]
+            A list of rows, where each row is a named tuple with the table columns as fields.
         """
         try:
-            rows = self.connection.execute("SELECT * FROM Results").fetchall()
+            with self.pool.connection() as conn, conn.cursor(row_factory=class_row(Result)) as cur:
+                rows = cur.execute(f"SELECT {_RESULT_COLUMNS} FROM Results").fetchall()
             return rows
         except Exception as e:
             print(e)
             raise e
+
+    def iter_all_results(self) -> Iterator[Result]:
+        """
+        Iterate over all rows from the Results table without loading the whole table.
+
+        The rows are read through a server-side cursor, CURSOR_ITERSIZE rows at a time.
+        The pooled connection is held until the iteration finishes or the generator is closed.
+
+        Yields
+        ------
+        Result
+            A named tuple with the table columns as fields.
+        """
+        try:
+            # Named cursors only live inside a transaction, the pooled connections are in autocommit
+            with self.pool.connection() as conn, conn.transaction(), \
+                    conn.cursor('all_results_cur', row_factory=class_row(Result)) as cur:
+                cur.itersize = CURSOR_ITERSIZE
+                cur.execute(f"SELECT {_RESULT_COLUMNS} FROM Results")
+                yield from cur
+        except Exception as e:
+            print(e)
+            raise e
     
 
     def retrieve_results_from_sports_and_places_page(self, places: list[str], sports: list[str],
                                                      page: int, items_per_page: int,
-                                                     sort_by: dict | None=None) -> list[dict_row]:
+                                                     sort_by: dict | None=None) -> tuple[list[ResultRow], int]:
         """
         Retrieve results based on specified places and sports (paginated)
 
@@ -465,59 +1351,69 @@ class DatabaseAPI:
 
         Returns
         -------
-        (list[dict_row], int)
+        tuple[list[ResultRow], int]
             A list of rows for the page and the total number of rows.
-            The format of the rows:
-            [{
-                place: str,
-                held: date,
-                sport: str,
-                athleteid: str,
-                name: str,
-                result: float
-            },...]
+            Each row is a named tuple with the fields place, held, sport, athleteid, name and result,
+            use row._asdict() where a dict is needed.
         """
         try:
-            # TODO: Task 1
-            # TODO: Remember to account for pages or if there is a sort order on a column.
-
-            # NOTE (Hint): Dynamically construct the query string with the correct number of %s placeholders (", ".join(["%s"] * len(array))
-
-            # TODO: We do also want to get results if only places or only sports have been specified.
-            query="""
-            SELECT c.place,c.held,s.name AS sport, a.id AS athleteid, a.name,r.result
-            FROM Results R
-            JOIN Competitions c ON r.competitionID= c.ID
-            JOIN Sports s ON r.sportID = s.ID
-            JOIN Athletes a ON r.athleteID = a.ID
-            """
-            filters=[]
+            # mv_results_denorm holds Results joined with Competitions, Sports and Athletes (sql/001_mv_results_denorm.sql),
+            # refreshed by the listener thread about a second after the tables change
+            from_clause = sql.SQL(" FROM mv_results_denorm m")
+            # The filter lists are joined as a relation so the planner can use the indexes on the view,
+            # long lists are copied into temporary tables instead of being sent as one array parameter
             values=[]
-            if places:
-                filters.append("c.place=ANY(%s)")
-                values.append(places)
-
-            if sports:
-                filters.append("s.name=ANY(%s)")
-                values.append(sports)
-
-            if filters:
-                query +=" WHERE " + " AND ".join(filters)
+            filter_tables=[]
+            for column, wanted, table in (('place', places, '_place_filter'), ('sport', sports, '_sport_filter')):
+                if not wanted:
+                    continue
+                wanted = list(dict.fromkeys(wanted)) # Duplicates would repeat rows in the join
+                names = {'table': sql.Identifier(table), 'column': sql.Identifier(column)}
+                if len(wanted) > COPY_FILTER_THRESHOLD:
+                    from_clause += sql.SQL(" JOIN {table} ON m.{column} = {table}.value").format(**names)
+                    filter_tables.append((table, wanted))
+                else:
+                    from_clause += sql.SQL(" JOIN unnest(%s::text[]) AS {table}(value) ON m.{column} = {table}.value").format(**names)
+                    values.append(wanted)
 
+            # The total is the last column, the others are the fields of ResultRow in order
+            query = sql.SQL("SELECT m.place, m.held, m.sport, m.athleteid, m.name, m.result, COUNT(*) OVER() AS total_count") + from_clause
+            filter_values = list(values)
 
+            key=None
+            order='asc'
             if sort_by:
-                valid_keys={"place","held","sport","athleteid","name","result"}
                 key=sort_by.get('key')
-                order=sort_by.get('order','asc')
-                if key in valid_keys and order.lower() in ['asc','desc']:
-                    query += f" ORDER BY {key} {order.upper()}"
-
-            rows= self.connection.execute(query,values).fetchall()
+                order=sort_by.get('order','asc').lower()
+            # Unknown keys or orders fall back to the default order, pages always need a total order
+            query += _RESULT_PAGE_ORDER_BY.get((key, order), _RESULT_PAGE_ORDER_BY[(None, 'asc')])
 
             start=(page-1)*items_per_page
-            end=start + items_per_page
-            paginated_rows=rows[start:end]
-            return (paginated_rows, len(rows))
+            query += sql.SQL(" LIMIT %s OFFSET %s")
+            values += [items_per_page, start]
+
+            with self.pool.connection() as conn:
+                # The temporary tables are dropped when the transaction commits, the fallback count sees the same snapshot as the page
+                with conn.transaction():
+                    for table, wanted in filter_tables:
+                        conn.execute(sql.SQL("CREATE TEMP TABLE {} (value text) ON COMMIT DROP").format(sql.Identifier(table)), prepare=False)
+                        with conn.cursor() as cur, cur.copy(sql.SQL("COPY {} (value) FROM STDIN").format(sql.Identifier(table))) as copy:
+                            for value in wanted:
+                                copy.write_row((value,))
+                    # Without temporary tables the text only depends on which filters and sort are given, so it is
+                    # prepared right away. Statements on the temporary tables would be replanned on every call anyway
+                    with conn.cursor(row_factory=tuple_row) as cur:
+                        rows= cur.execute(query,values,prepare=not filter_tables).fetchall()
+                    if rows:
+                        total = rows[0][-1]
+                    elif start > 0:
+                        # A page past the last row has no row to carry the window count
+                        total = conn.execute(sql.SQL("SELECT COUNT(*) AS total_count") + from_clause, filter_values,
+                                             prepare=not filter_tables).fetchone()['total_count']
+                    else:
+                        total = 0
+
+            return ([ResultRow._make(row[:-1]) for row in rows], total)
     
         except Exception as e:
             print(e)
@@ -536,48 +1432,41 @@ class DatabaseAPI:
         force_delete: bool
             Whether to force the deletion even if there are dependencies.
         """
+        # The role check, the dependency check and the deletes are a single statement.
+        # Nothing is deleted unless the user is an editor, and the sport itself is kept
+        # if it has dependencies and force_delete is False
+        query = """
+            WITH u AS (SELECT role_name FROM Users WHERE username=%(username)s),
+            allowed AS (SELECT EXISTS (SELECT 1 FROM u WHERE role_name = ANY(%(roles)s)) AS ok),
+            sport AS (SELECT id FROM Sports WHERE name=%(sport)s),
+            dependencies AS (
+                SELECT EXISTS (SELECT 1 FROM Results r JOIN sport s ON r.sportID = s.id) AS found
+            ),
+            del_results AS (
+                DELETE FROM Results r USING sport s
+                WHERE r.sportID = s.id AND %(force)s AND (SELECT ok FROM allowed)
+            ),
+            del_sport AS (
+                DELETE FROM Sports WHERE id IN (SELECT id FROM sport)
+                AND (SELECT ok FROM allowed) AND (%(force)s OR NOT (SELECT found FROM dependencies))
+            )
+            SELECT (SELECT role_name FROM u) AS role_name, (SELECT found FROM dependencies) AS has_dependencies
+            """
         try:
-            # Check if the user exists and their role
-            role_query = "SELECT role_name FROM Users WHERE username=%s"
-            role_result = self.connection.execute(role_query, (username,)).fetchone()
+            params = {'username': username, 'roles': EDITOR_ROLES, 'sport': sport_name, 'force': force_delete}
+            with self.pool.connection() as conn:
+                result = conn.execute(query, params).fetchone()
 
-            if role_result is None:
+            if result['role_name'] is None:
                 raise Exception("Username not found")
 
-            role = role_result[0]
-
             # Check if user has the correct role
-            if role not in ["editor", "theone"]:
+            if result['role_name'] not in EDITOR_ROLES:
                 raise PermissionError("You do not have permission to delete a sport.")
 
-            # Check for dependencies (e.g., results, competitions)
-            dependencies_check_query = """
-                SELECT 1 FROM Results WHERE sport_id = (SELECT id FROM Sports WHERE name=%s)
-                UNION
-                SELECT 1 FROM Competitions WHERE sport_id = (SELECT id FROM Sports WHERE name=%s)
-                """
-            dependencies = self.connection.execute(dependencies_check_query, (sport_name, sport_name)).fetchall()
-
             # If there are dependencies and force_delete is False, raise an error
-            if dependencies and not force_delete:
+            if result['has_dependencies'] and not force_delete:
                 raise Exception(f"Cannot delete sport '{sport_name}' because it has associated records in other tables.")
-
-            # If force_delete is True or no dependencies are found, delete related records
-            if force_delete:
-                delete_results_query = """
-                    DELETE FROM Results WHERE sport_id = (SELECT id FROM Sports WHERE name=%s)
-                """
-                self.connection.execute(delete_results_query, (sport_name,))
-
-                delete_competitions_query = """
-                    DELETE FROM Competitions WHERE sport_id = (SELECT id FROM Sports WHERE name=%s)
-                """
-                self.connection.execute(delete_competitions_query, (sport_name,))
-
-            # Now delete the sport itself
-            delete_sport_query = "DELETE FROM Sports WHERE name=%s"
-            self.connection.execute(delete_sport_query, (sport_name,))
-            self.connection.commit()
         
         except Exception as e:
             print(e)
@@ -587,9 +1476,17 @@ class DatabaseAPI:
     def create_role_and_user(self,conn, role_name, username, password):
         """
         Creates a new role with specific permissions and adds a user with that role.
+
+        conn may be in autocommit or not. Without autocommit the work is committed here,
+        together with any transaction the caller already had open, and an error rolls that back too.
         """
         try:
-            with conn.cursor() as cur:
+            # Hash the password before the transaction starts, so no locks are held while bcrypt runs
+            hashed_password = bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_COST))
+
+            # The role, its grants and the user are committed together, or rolled back together on an error.
+            # Inside a transaction the caller opened, transaction() is only a savepoint, hence the commit below
+            with conn.transaction(), conn.cursor() as cur:
                 # Create the new role
                 cur.execute(f"CREATE ROLE {role_name} WITH LOGIN;")
                 
@@ -597,32 +1494,35 @@ class DatabaseAPI:
                 cur.execute(f"GRANT INSERT ON Competitions TO {role_name};")
                 cur.execute(f"GRANT SELECT ON Athletes, Results TO {role_name};")
                 
-                # Hash the password
-                hashed_password = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-                
                 # Insert new user
-                cur.execute("INSERT INTO Users (username, password_hash, role_name) VALUES (%s, %s, %s);", (username, hashed_password, role_name))
+                cur.execute("INSERT INTO Users (username, password_hashed, role_name) VALUES (%s, %s, %s);", (username, hashed_password, role_name))
                 
+            if not conn.autocommit:
                 conn.commit()
-                print(f"Role '{role_name}' and user '{username}' created successfully.")
+            print(f"Role '{role_name}' and user '{username}' created successfully.")
         except Exception as e:
-            conn.rollback()
+            if not conn.autocommit:
+                conn.rollback()
             print("Error creating role and user:", e)
 
         
 
-    def retrieve_all_genders(self) -> list[dict_row]:
+    def retrieve_all_genders(self) -> list[tuple]:
         """
         Get all rows from the Genders table.
 
+        The table is static reference data, so it is only queried once.
+
         Returns
         -------
-        list[dict_row]
-            A list of rows, where each row is a dict with the table columns as keys.
+        list[tuple]
+            A list of rows, where each row is a named tuple with the table columns as fields.
         """
         try:
-            rows = self.connection.execute("SELECT * FROM Gender").fetchall()
-            return rows
+            if self._genders_cache is None:
+                with self.pool.connection() as conn, conn.cursor(row_factory=namedtuple_row) as cur:
+                    self._genders_cache = cur.execute("SELECT * FROM Gender", prepare=True).fetchall()
+            return list(self._genders_cache)
         except Exception as e:
             print(e)
             raise e
\ No newline at end of file
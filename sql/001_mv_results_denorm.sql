@@ -0,0 +1,121 @@
+-- Results joined with their competition, sport and athlete, as read by
+-- DatabaseAPI.retrieve_results_from_sports_and_places_page.
+-- The join is computed on write instead of on every page request.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_results_denorm AS
+SELECT c.place, c.held, s.name AS sport, a.id AS athleteid, a.name, r.result
+FROM Results r
+JOIN Competitions c ON r.competitionID = c.ID
+JOIN Sports s ON r.sportID = s.ID
+JOIN Athletes a ON r.athleteID = a.ID;
+
+CREATE INDEX IF NOT EXISTS mv_results_denorm_place_sport_held_idx ON mv_results_denorm (place, sport, held);
+CREATE INDEX IF NOT EXISTS mv_results_denorm_sport_idx ON mv_results_denorm (sport);
+CREATE INDEX IF NOT EXISTS mv_results_denorm_held_idx ON mv_results_denorm (held);
+
+-- The view is not refreshed by the writing statements themselves: a refresh
+-- recomputes the whole join and holds ACCESS EXCLUSIVE on the view until the
+-- writer commits, which blocked every reader and serialized all writers.
+-- Instead the triggers notify mv_results_denorm_stale, and the listener thread
+-- of DatabaseAPI refreshes the view at most about once a second, after the
+-- writes committed (PostgreSQL folds identical notifications of a transaction
+-- into one). Pages may therefore lag the tables by a moment, and changes made
+-- while no DatabaseAPI is listening are only picked up with the next one.
+-- Statements that changed no rows (a refused delete_sport, say) don't notify,
+-- the transition table "changed" holds the rows a statement touched.
+-- Transition tables allow one event per trigger and none for TRUNCATE, hence
+-- one trigger per event, with TRUNCATE always notifying.
+
+-- Replaced by the notifying triggers below
+DROP TRIGGER IF EXISTS results_refresh_mv_results_denorm ON Results;
+DROP TRIGGER IF EXISTS competitions_refresh_mv_results_denorm ON Competitions;
+DROP TRIGGER IF EXISTS sports_refresh_mv_results_denorm ON Sports;
+DROP TRIGGER IF EXISTS athletes_refresh_mv_results_denorm ON Athletes;
+DROP TRIGGER IF EXISTS results_insert_refresh_mv_results_denorm ON Results;
+DROP TRIGGER IF EXISTS results_update_refresh_mv_results_denorm ON Results;
+DROP TRIGGER IF EXISTS results_delete_refresh_mv_results_denorm ON Results;
+DROP TRIGGER IF EXISTS results_truncate_refresh_mv_results_denorm ON Results;
+DROP TRIGGER IF EXISTS competitions_update_refresh_mv_results_denorm ON Competitions;
+DROP TRIGGER IF EXISTS competitions_delete_refresh_mv_results_denorm ON Competitions;
+DROP TRIGGER IF EXISTS competitions_truncate_refresh_mv_results_denorm ON Competitions;
+DROP TRIGGER IF EXISTS sports_update_refresh_mv_results_denorm ON Sports;
+DROP TRIGGER IF EXISTS sports_delete_refresh_mv_results_denorm ON Sports;
+DROP TRIGGER IF EXISTS sports_truncate_refresh_mv_results_denorm ON Sports;
+DROP TRIGGER IF EXISTS athletes_update_refresh_mv_results_denorm ON Athletes;
+DROP TRIGGER IF EXISTS athletes_delete_refresh_mv_results_denorm ON Athletes;
+DROP TRIGGER IF EXISTS athletes_truncate_refresh_mv_results_denorm ON Athletes;
+DROP FUNCTION IF EXISTS refresh_mv_results_denorm_if_changed();
+DROP FUNCTION IF EXISTS refresh_mv_results_denorm();
+
+-- Called by the DatabaseAPI listener. SECURITY DEFINER so the refresh runs as
+-- the view owner whichever role connected, with a fixed search_path so the
+-- caller cannot substitute its own objects.
+CREATE OR REPLACE FUNCTION refresh_mv_results_denorm() RETURNS void
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW mv_results_denorm;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_mv_results_denorm_stale() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('mv_results_denorm_stale', '');
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_mv_results_denorm_stale_if_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM changed) THEN
+        PERFORM pg_notify('mv_results_denorm_stale', '');
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE TRIGGER results_insert_notify_mv_results_denorm_stale
+    AFTER INSERT ON Results REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale_if_changed();
+CREATE OR REPLACE TRIGGER results_update_notify_mv_results_denorm_stale
+    AFTER UPDATE ON Results REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale_if_changed();
+CREATE OR REPLACE TRIGGER results_delete_notify_mv_results_denorm_stale
+    AFTER DELETE ON Results REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale_if_changed();
+CREATE OR REPLACE TRIGGER results_truncate_notify_mv_results_denorm_stale
+    AFTER TRUNCATE ON Results
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale();
+
+-- Inserting a competition, sport or athlete cannot add rows until a result
+-- references it, so only updates and deletes of those tables are watched.
+CREATE OR REPLACE TRIGGER competitions_update_notify_mv_results_denorm_stale
+    AFTER UPDATE ON Competitions REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale_if_changed();
+CREATE OR REPLACE TRIGGER competitions_delete_notify_mv_results_denorm_stale
+    AFTER DELETE ON Competitions REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale_if_changed();
+CREATE OR REPLACE TRIGGER competitions_truncate_notify_mv_results_denorm_stale
+    AFTER TRUNCATE ON Competitions
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale();
+
+CREATE OR REPLACE TRIGGER sports_update_notify_mv_results_denorm_stale
+    AFTER UPDATE ON Sports REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale_if_changed();
+CREATE OR REPLACE TRIGGER sports_delete_notify_mv_results_denorm_stale
+    AFTER DELETE ON Sports REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale_if_changed();
+CREATE OR REPLACE TRIGGER sports_truncate_notify_mv_results_denorm_stale
+    AFTER TRUNCATE ON Sports
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale();
+
+CREATE OR REPLACE TRIGGER athletes_update_notify_mv_results_denorm_stale
+    AFTER UPDATE ON Athletes REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale_if_changed();
+CREATE OR REPLACE TRIGGER athletes_delete_notify_mv_results_denorm_stale
+    AFTER DELETE ON Athletes REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale_if_changed();
+CREATE OR REPLACE TRIGGER athletes_truncate_notify_mv_results_denorm_stale
+    AFTER TRUNCATE ON Athletes
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_mv_results_denorm_stale();
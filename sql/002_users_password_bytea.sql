@@ -0,0 +1,7 @@
+-- Store bcrypt hashes as bytes so they are passed to bcrypt without
+-- re-encoding on every login, and allow a per-user bcrypt cost.
+-- A NULL cost means DatabaseAPI's default (BCRYPT_COST); hashes made with a
+-- higher cost than the user's target are rehashed on their next login.
+
+ALTER TABLE Users ALTER COLUMN password_hashed TYPE bytea USING convert_to(password_hashed, 'UTF8');
+ALTER TABLE Users ADD COLUMN IF NOT EXISTS cost integer;
@@ -0,0 +1,15 @@
+-- Tell listening DatabaseAPI instances that the set of competition places may
+-- have changed, so they drop their cached result of retrieve_competition_places.
+-- Notifications are sent when the writing transaction commits.
+
+CREATE OR REPLACE FUNCTION notify_places_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('places_changed', '');
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE TRIGGER competitions_notify_places_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Competitions
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_places_changed();
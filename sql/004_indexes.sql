@@ -0,0 +1,18 @@
+-- Indexes for the lookups and sort orders used by DatabaseAPI.
+
+-- Login and role checks: index-only scans, the heap is never touched.
+CREATE UNIQUE INDEX IF NOT EXISTS users_username_idx ON Users (username) INCLUDE (role_name, password_hashed, cost);
+
+-- retrieve_competitions_from_place_page filters on place and sorts on held,
+-- retrieve_competition_places skips through it one distinct place at a time.
+CREATE INDEX IF NOT EXISTS competitions_place_held_idx ON Competitions (place, held);
+
+-- retrieve_athletes_page seeks on (sort key, id) for every sortable column,
+-- id itself is covered by the primary key.
+CREATE INDEX IF NOT EXISTS athletes_name_id_idx ON Athletes (name, id);
+CREATE INDEX IF NOT EXISTS athletes_gender_id_idx ON Athletes (gender, id);
+CREATE INDEX IF NOT EXISTS athletes_height_id_idx ON Athletes (height, id);
+
+-- delete_sport looks the sport up by name and deletes its results.
+CREATE INDEX IF NOT EXISTS sports_name_idx ON Sports (name);
+CREATE INDEX IF NOT EXISTS results_sportid_idx ON Results (sportID);
@@ -0,0 +1,31 @@
+-- Role check, date validation and insert of DatabaseAPI.add_competition in one call.
+-- p_roles are the roles allowed to add competitions (EDITOR_ROLES in file.py).
+-- Errors are raised with SQLSTATEs that add_competition maps back to Python exceptions:
+--   P0002 (no_data_found)           the user does not exist
+--   42501 (insufficient_privilege)  the user is not an editor
+--   22008 (datetime_field_overflow) the competition is held before 2024
+-- Runs with the caller's privileges, like the other statements of DatabaseAPI:
+-- the roles come from the caller, so they must not unlock anything the caller
+-- could not do itself.
+DROP FUNCTION IF EXISTS insert_competition(text, text, date);
+
+CREATE OR REPLACE FUNCTION insert_competition(p_user text, p_place text, p_held date, p_roles text[]) RETURNS integer
+LANGUAGE plpgsql SET search_path = public AS $$
+DECLARE
+    r text;
+    new_id integer;
+BEGIN
+    SELECT role_name INTO r FROM Users WHERE username = p_user;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Username not found' USING ERRCODE = 'P0002';
+    END IF;
+    IF r IS NULL OR NOT r = ANY(p_roles) THEN
+        RAISE EXCEPTION 'you have no permission to add competitions.' USING ERRCODE = '42501';
+    END IF;
+    IF extract(year FROM p_held) < 2024 THEN
+        RAISE EXCEPTION 'Competitions have to be held after 2024.' USING ERRCODE = '22008';
+    END IF;
+    INSERT INTO Competitions (place, held) VALUES (p_place, p_held) RETURNING id INTO new_id;
+    RETURN new_id;
+END
+$$;